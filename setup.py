@@ -0,0 +1,18 @@
+"""
+Builds the optional compiled JPEG EXIF scanner used by photoSort.py:
+
+    python setup.py build_ext --inplace
+
+photoSort.py falls back to a pure-Python scanner when it is not built.
+``pip install .`` installs photoSort.py together with the scanner.
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='photoSort',
+    package_dir={'': 'src'},
+    py_modules=['photoSort'],
+    ext_modules=cythonize('src/_exif_scan.pyx'),
+)
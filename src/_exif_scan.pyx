@@ -0,0 +1,122 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+_exif_scan.pyx - Compiled JPEG EXIF date scanner for photoSort.
+
+A C implementation of photoSort._py_parse_jpeg_datetime: it finds the
+DateTimeOriginal tag in the first bytes of a JPEG file without creating any
+Python objects while scanning. Build it with:
+
+    python setup.py build_ext --inplace
+"""
+
+cdef inline unsigned int _u16(const unsigned char[:] buf, Py_ssize_t pos, bint little) noexcept nogil:
+    if little:
+        return buf[pos] | (buf[pos + 1] << 8)
+    return (buf[pos] << 8) | buf[pos + 1]
+
+cdef inline unsigned int _u32(const unsigned char[:] buf, Py_ssize_t pos, bint little) noexcept nogil:
+    if little:
+        return (buf[pos] | (buf[pos + 1] << 8) | (buf[pos + 2] << 16)
+                | (<unsigned int>buf[pos + 3] << 24))
+    return ((<unsigned int>buf[pos] << 24) | (buf[pos + 1] << 16)
+            | (buf[pos + 2] << 8) | buf[pos + 3])
+
+cdef Py_ssize_t _find_ifd_entry(const unsigned char[:] buf, Py_ssize_t n, Py_ssize_t ifd,
+                                bint little, unsigned int tag) noexcept nogil:
+    """Return the offset of a tag's entry in a TIFF IFD, or -1 if absent."""
+    cdef unsigned int count, i
+    cdef Py_ssize_t entry
+    if ifd + 2 > n:
+        return -1
+    count = _u16(buf, ifd, little)
+    entry = ifd + 2
+    for i in range(count):
+        if entry + 12 > n:
+            return -1
+        if _u16(buf, entry, little) == tag:
+            return entry
+        entry += 12
+    return -1
+
+cdef int _digits(const unsigned char[:] buf, Py_ssize_t pos, int width) noexcept nogil:
+    """Parse a fixed-width decimal field, or return -1 if it is not all digits."""
+    cdef int value = 0
+    cdef int i
+    cdef unsigned char c
+    for i in range(width):
+        c = buf[pos + i]
+        if c < 48 or c > 57:
+            return -1
+        value = value * 10 + (c - 48)
+    return value
+
+def parse_jpeg_datetime(const unsigned char[:] buf):
+    """Return DateTimeOriginal from the start of a JPEG file as a tuple of ints.
+
+    The tuple is (year, month, day, hour, minute, second). Returns None if the
+    date is absent, malformed or not within ``buf``.
+    """
+    cdef Py_ssize_t n = buf.shape[0]
+    cdef Py_ssize_t pos = 2
+    cdef Py_ssize_t tiff, entry, value
+    cdef unsigned char marker
+    cdef bint little
+    cdef int year, month, day, hour, minute, second
+
+    if n < 2 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+
+    # Walk the JPEG segments to the APP1 EXIF segment
+    while True:
+        if pos + 4 > n or buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            # Padding before a marker
+            pos += 1
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # End of image or start of scan: no metadata follows
+            return None
+        if (marker == 0xE1 and pos + 10 <= n and buf[pos + 4] == b'E' and buf[pos + 5] == b'x'
+                and buf[pos + 6] == b'i' and buf[pos + 7] == b'f'
+                and buf[pos + 8] == 0 and buf[pos + 9] == 0):
+            break
+        pos += 2 + _u16(buf, pos + 2, False)
+
+    # Offsets in the EXIF data are relative to the TIFF header
+    tiff = pos + 10
+    if tiff + 8 > n:
+        return None
+    if buf[tiff] == b'I' and buf[tiff + 1] == b'I':
+        little = True
+    elif buf[tiff] == b'M' and buf[tiff + 1] == b'M':
+        little = False
+    else:
+        return None
+    if _u16(buf, tiff + 2, little) != 42:
+        return None
+
+    entry = _find_ifd_entry(buf, n, tiff + _u32(buf, tiff + 4, little), little, 0x8769)
+    if entry < 0:
+        return None
+    entry = _find_ifd_entry(buf, n, tiff + _u32(buf, entry + 8, little), little, 0x9003)
+    if entry < 0:
+        return None
+
+    # Expect ASCII 'YYYY:MM:DD HH:MM:SS' plus its NUL terminator
+    if _u16(buf, entry + 2, little) != 2 or _u32(buf, entry + 4, little) < 19:
+        return None
+    value = tiff + _u32(buf, entry + 8, little)
+    if value + 19 > n:
+        return None
+
+    year = _digits(buf, value, 4)
+    month = _digits(buf, value + 5, 2)
+    day = _digits(buf, value + 8, 2)
+    hour = _digits(buf, value + 11, 2)
+    minute = _digits(buf, value + 14, 2)
+    second = _digits(buf, value + 17, 2)
+    if year < 0 or month < 0 or day < 0 or hour < 0 or minute < 0 or second < 0:
+        return None
+    return (year, month, day, hour, minute, second)
@@ -12,14 +12,20 @@ import sys
 import shutil
 import argparse
 import logging
-from datetime import datetime
-from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import mimetypes
+import struct
+import json
+import sqlite3
+import subprocess
+import queue
+import threading
 
 # For EXIF data extraction
 try:
     from PIL import Image
-    from PIL.ExifTags import TAGS
     HAS_PIL = True
 except ImportError:
     HAS_PIL = False
@@ -42,6 +48,24 @@ try:
 except ImportError:
     HAS_PIEXIF = False
 
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+HAS_FADVISE = hasattr(os, 'posix_fadvise')
+
+# Compiled JPEG EXIF scanner, built from _exif_scan.pyx
+try:
+    import _exif_scan
+    HAS_EXIF_SCAN = True
+except ImportError:
+    HAS_EXIF_SCAN = False
+
+# exiftool can read dates from every supported format in one long-running process
+HAS_EXIFTOOL = shutil.which('exiftool') is not None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -50,10 +74,64 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # File types to process
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp', '.heic', '.heif', '.dng'}
-VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.m4v', '.3gp', '.flv'}
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp', '.heic', '.heif', '.dng'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.m4v', '.3gp', '.flv'})
 MEDIA_EXTENSIONS = IMAGE_EXTENSIONS.union(VIDEO_EXTENSIONS)
 
+# JPEG files whose EXIF segment is parsed directly
+JPEG_EXTENSIONS = frozenset({'.jpg', '.jpeg'})
+
+# Bytes read from the start of a JPEG when looking for its EXIF segment
+JPEG_HEADER_SIZE = 64 * 1024
+
+# Image formats piexif can read EXIF data from
+PIEXIF_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.tiff', '.tif'})
+
+# Video containers based on the ISO base media file format (QuickTime/MP4),
+# whose creation time can be read straight from the mvhd atom
+ISOBMFF_EXTENSIONS = frozenset({'.mp4', '.mov', '.m4v', '.3gp'})
+
+# Epoch used by QuickTime/MP4 timestamps
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+# Linux ioctl that makes dst share src's data blocks (Btrfs, XFS reflinks)
+FICLONE = 0x40049409
+
+# Maximum number of bytes handed to a single os.sendfile call
+SENDFILE_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Maximum number of media files queued between the directory walk and the
+# metadata readers, and of date reads in flight at once
+MEDIA_QUEUE_SIZE = 1024
+
+# Index of already-copied files, kept in the destination directory
+INDEX_FILE_NAME = '.photosort.db'
+
+# Number of index updates between commits
+INDEX_COMMIT_INTERVAL = 500
+
+# Month names used in destination directory names
+_MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Destination directories already created by this process
+_created_dirs = set()
+
+# Device IDs of destination directories, to avoid a stat per moved file
+_dest_devices = {}
+
+def _file_name(file_path):
+    """Return the last component of a path; a cheaper os.path.basename for walked paths."""
+    return file_path.rpartition(os.sep)[2]
+
+def _file_ext(file_path):
+    """Return the lowercased extension of a path, like os.path.splitext()[1].lower()."""
+    stem, dot, ext = _file_name(file_path).rpartition('.')
+    # As with splitext, leading dots (e.g. ".jpg") do not start an extension
+    if not stem.lstrip('.'):
+        return ''
+    return dot + ext.lower()
+
 def check_dependencies():
     """Check if required dependencies are installed."""
     if not HAS_PIL and not HAS_EXIFREAD:
@@ -61,8 +139,8 @@ def check_dependencies():
         logger.error("Install with: pip install Pillow exifread")
         return False
     
-    if not HAS_FFMPEG and any(VIDEO_EXTENSIONS):
-        logger.warning("ffmpeg-python is not installed. Video date extraction may be limited.")
+    if not HAS_FFMPEG and any(VIDEO_EXTENSIONS - ISOBMFF_EXTENSIONS):
+        logger.warning("ffmpeg-python is not installed. Date extraction for AVI/MKV/WMV/FLV videos is disabled.")
         logger.warning("Install with: pip install ffmpeg-python")
     
     if not HAS_PIEXIF:
@@ -71,95 +149,434 @@ def check_dependencies():
     
     return True
 
-def get_date_taken_from_image(file_path):
-    """Extract the date taken from image EXIF data."""
-    # Try with PIL first
-    if HAS_PIL:
+def _exif_datetime(fields):
+    """Build a datetime from EXIF date fields, or None if the date is impossible.
+
+    Cameras whose clock was never set write 0000:00:00 00:00:00, which is
+    treated as no date rather than as an error.
+    """
+    try:
+        return datetime(*fields)
+    except ValueError:
+        return None
+
+def _parse_exif_dt(value):
+    """Parse an EXIF 'YYYY:MM:DD HH:MM:SS' date string, or return None if it is invalid."""
+    try:
+        # Slicing the fixed-width fields is much faster than strptime
+        fields = (int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                  int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    except ValueError:
         try:
-            with Image.open(file_path) as img:
-                exif_data = img._getexif()
-                if exif_data:
-                    for tag_id, value in exif_data.items():
-                        tag = TAGS.get(tag_id, tag_id)
-                        if tag == 'DateTimeOriginal':
-                            return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
-        except Exception as e:
-            logger.error(f"PIL EXIF extraction failed for {file_path}: {e}")
+            return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            return None
+    return _exif_datetime(fields)
+
+def _find_ifd_entry(buf, order, ifd, tag):
+    """Return the offset of a tag's entry in a TIFF IFD, or None if absent."""
+    count = struct.unpack_from(order + 'H', buf, ifd)[0]
+    for entry in range(ifd + 2, ifd + 2 + 12 * count, 12):
+        if struct.unpack_from(order + 'H', buf, entry)[0] == tag:
+            return entry
+    return None
+
+def _find_exif_datetime(buf):
+    """Find the raw DateTimeOriginal value in the first bytes of a JPEG file.
+
+    Walks the JPEG segments to the APP1 EXIF segment, then the TIFF structure
+    inside it: IFD0, the Exif IFD pointer (0x8769) and the DateTimeOriginal tag
+    (0x9003). Returns None if the date is absent or not within ``buf``.
+    """
+    if buf[:2] != b'\xff\xd8':
+        return None
     
-    # Try with exifread as fallback
-    if HAS_EXIFREAD:
-        try:
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=False)
-                if 'EXIF DateTimeOriginal' in tags:
-                    date_str = str(tags['EXIF DateTimeOriginal'])
-                    return datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
-        except Exception as e:
-            logger.error(f"exifread extraction failed for {file_path}: {e}")
+    pos = 2
+    while pos + 4 <= len(buf):
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            # Padding before a marker
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan: no metadata follows
+            return None
+        size = struct.unpack_from('>H', buf, pos + 2)[0]
+        if marker == 0xE1 and buf[pos + 4:pos + 10] == b'Exif\0\0':
+            break
+        pos += 2 + size
+    else:
+        return None
+    
+    # Offsets in the EXIF data are relative to the TIFF header
+    tiff = pos + 10
+    byte_order = buf[tiff:tiff + 2]
+    if byte_order == b'II':
+        order = '<'
+    elif byte_order == b'MM':
+        order = '>'
+    else:
+        return None
+    if struct.unpack_from(order + 'H', buf, tiff + 2)[0] != 42:
+        return None
     
+    ifd0 = tiff + struct.unpack_from(order + 'I', buf, tiff + 4)[0]
+    entry = _find_ifd_entry(buf, order, ifd0, 0x8769)
+    if entry is None:
+        return None
+    exif_ifd = tiff + struct.unpack_from(order + 'I', buf, entry + 8)[0]
+    
+    entry = _find_ifd_entry(buf, order, exif_ifd, 0x9003)
+    if entry is None:
+        return None
+    value_type, count = struct.unpack_from(order + 'HI', buf, entry + 2)
+    # Expect ASCII 'YYYY:MM:DD HH:MM:SS' plus its NUL terminator
+    if value_type != 2 or count < 19:
+        return None
+    value = tiff + struct.unpack_from(order + 'I', buf, entry + 8)[0]
+    if value + 19 > len(buf):
+        return None
+    return buf[value:value + 19]
+
+def _py_parse_jpeg_datetime(buf):
+    """Return DateTimeOriginal from the start of a JPEG file as a tuple of ints.
+
+    The tuple is (year, month, day, hour, minute, second). Returns None if the
+    date is absent, malformed or not within ``buf``. This is the pure-Python
+    version of _exif_scan.parse_jpeg_datetime.
+    """
+    try:
+        value = _find_exif_datetime(buf)
+    except struct.error:
+        # Truncated or corrupt EXIF data
+        return None
+    if value is None:
+        return None
+    fields = (value[0:4], value[5:7], value[8:10], value[11:13], value[14:16], value[17:19])
+    if not all(field.isdigit() for field in fields):
+        return None
+    return tuple(int(field) for field in fields)
+
+if HAS_EXIF_SCAN:
+    _parse_jpeg_datetime = _exif_scan.parse_jpeg_datetime
+else:
+    _parse_jpeg_datetime = _py_parse_jpeg_datetime
+
+def _fast_jpeg_date(file_path, file_ext):
+    """Extract the date taken from a JPEG by parsing its EXIF segment directly."""
+    if file_ext not in JPEG_EXTENSIONS:
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            if HAS_FADVISE:
+                # Ask the kernel to read ahead aggressively
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            buf = f.read(JPEG_HEADER_SIZE)
+        fields = _parse_jpeg_datetime(buf)
+        if fields is None:
+            # Leave files without a usable date to the other readers
+            return None
+        return _exif_datetime(fields)
+    except Exception as e:
+        logger.error("EXIF extraction failed for %s: %s", file_path, e)
+        return None
+
+def _date_from_piexif(file_path, file_ext):
+    """Extract the date taken from a JPEG/TIFF file using piexif."""
+    if file_ext not in PIEXIF_EXTENSIONS:
+        return None
+    try:
+        exif_dict = piexif.load(file_path)
+        # Fall back to the IFD0 DateTime, as the PIL reader does
+        value = (exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal)
+                 or exif_dict["0th"].get(piexif.ImageIFD.DateTime))
+        if value is None:
+            return None
+        return _parse_exif_dt(value.decode('ascii'))
+    except Exception as e:
+        logger.error("piexif extraction failed for %s: %s", file_path, e)
+        return None
+
+def _date_from_pil(file_path, file_ext):
+    """Extract the date taken from an image using PIL."""
+    # piexif reads the same data without constructing an image
+    if HAS_PIEXIF and file_ext in PIEXIF_EXTENSIONS:
+        return None
+    try:
+        with Image.open(file_path, mode='r') as img:
+            exif_data = img.getexif()
+            # DateTimeOriginal (0x9003) lives in the Exif sub-IFD (0x8769);
+            # fall back to the IFD0 DateTime (0x0132)
+            value = exif_data.get_ifd(0x8769).get(0x9003) or exif_data.get(0x0132)
+            if value:
+                return _parse_exif_dt(value)
+    except Exception as e:
+        logger.error("PIL EXIF extraction failed for %s: %s", file_path, e)
     return None
 
-def get_date_taken_from_video(file_path):
-    """Extract the creation date from video metadata."""
-    if HAS_FFMPEG:
-        try:
-            probe = ffmpeg.probe(file_path)
-            creation_time = None
-            
-            # Try to find creation_time in metadata
-            if 'format' in probe and 'tags' in probe['format']:
-                tags = probe['format']['tags']
-                if 'creation_time' in tags:
-                    creation_time = tags['creation_time']
-            
-            # Check streams if not found in format
-            if not creation_time and 'streams' in probe:
-                for stream in probe['streams']:
-                    if 'tags' in stream and 'creation_time' in stream['tags']:
-                        creation_time = stream['tags']['creation_time']
-                        break
-            
-            if creation_time:
-                # Handle different date formats
+def _date_from_exifread(file_path, file_ext):
+    """Extract the date taken from an image using exifread."""
+    try:
+        with open(file_path, 'rb') as f:
+            # Stop parsing once the tag we need has been read
+            tags = exifread.process_file(f, details=False, stop_tag='DateTimeOriginal')
+            # IFD0 DateTime is read before the Exif IFD, so it is always present if set
+            for tag in ('EXIF DateTimeOriginal', 'Image DateTime'):
+                if tag in tags:
+                    return _parse_exif_dt(str(tags[tag]))
+    except Exception as e:
+        logger.error("exifread extraction failed for %s: %s", file_path, e)
+    return None
+
+# Image date readers, cheapest first, leaving out those whose library is not
+# installed. Each takes (file_path, file_ext) and returns None if it has no date.
+_IMAGE_DATE_EXTRACTORS = tuple(fn for fn, available in [
+    (_fast_jpeg_date, True),
+    (_date_from_piexif, HAS_PIEXIF),
+    (_date_from_pil, HAS_PIL),
+    (_date_from_exifread, HAS_EXIFREAD),
+] if available)
+
+def get_date_taken_from_image(file_path, file_ext=None):
+    """Extract the date taken from image EXIF data."""
+    if file_ext is None:
+        file_ext = _file_ext(file_path)
+    
+    for extractor in _IMAGE_DATE_EXTRACTORS:
+        date_taken = extractor(file_path, file_ext)
+        if date_taken is not None:
+            return date_taken
+    
+    return None
+
+def _read_atom_header(f):
+    """Read an MP4 atom header, returning (type, payload size) or None at EOF."""
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, atom_type = struct.unpack('>I4s', header)
+    if size == 1:
+        # 64-bit extended size follows the type
+        extended = f.read(8)
+        if len(extended) < 8:
+            return None
+        size = struct.unpack('>Q', extended)[0] - 16
+    elif size == 0:
+        # Atom extends to the end of the file
+        size = os.fstat(f.fileno()).st_size - f.tell()
+    else:
+        size -= 8
+    if size < 0:
+        raise ValueError(f"Invalid size for atom {atom_type!r}")
+    return atom_type, size
+
+def _read_mp4_creation_time(file_path):
+    """Read the creation time from the mvhd atom of an MP4/QuickTime file.
+
+    Only the atom headers and the few bytes of the mvhd atom are read, so this
+    is far cheaper than probing the whole container with ffprobe.
+    """
+    with open(file_path, 'rb') as f:
+        # Find the top-level moov atom
+        while True:
+            atom = _read_atom_header(f)
+            if atom is None:
+                return None
+            atom_type, size = atom
+            if atom_type == b'moov':
+                moov_end = f.tell() + size
+                break
+            f.seek(size, 1)
+        
+        # Find mvhd inside moov
+        while f.tell() < moov_end:
+            atom = _read_atom_header(f)
+            if atom is None:
+                return None
+            atom_type, size = atom
+            if atom_type == b'mvhd':
+                version = f.read(4)[0]  # version byte followed by 3 bytes of flags
+                if version == 1:
+                    seconds = struct.unpack('>Q', f.read(8))[0]
+                else:
+                    seconds = struct.unpack('>I', f.read(4))[0]
+                # Zero means the creation time was never set
+                if seconds == 0:
+                    return None
+                return MP4_EPOCH + timedelta(seconds=seconds)
+            f.seek(size, 1)
+    
+    return None
+
+def _date_from_mp4(file_path, file_ext):
+    """Extract the creation date of an MP4/QuickTime file from its mvhd atom."""
+    if file_ext not in ISOBMFF_EXTENSIONS:
+        return None
+    try:
+        return _read_mp4_creation_time(file_path)
+    except Exception as e:
+        logger.error("MP4 metadata extraction failed for %s: %s", file_path, e)
+        return None
+
+def _date_from_ffprobe(file_path, file_ext):
+    """Extract the creation date of a video using ffprobe."""
+    # MP4/QuickTime files are read directly; ffprobe is only needed for other containers
+    if file_ext in ISOBMFF_EXTENSIONS:
+        return None
+    try:
+        probe = ffmpeg.probe(file_path)
+        creation_time = None
+        
+        # Try to find creation_time in metadata
+        if 'format' in probe and 'tags' in probe['format']:
+            tags = probe['format']['tags']
+            if 'creation_time' in tags:
+                creation_time = tags['creation_time']
+        
+        # Check streams if not found in format
+        if not creation_time and 'streams' in probe:
+            for stream in probe['streams']:
+                if 'tags' in stream and 'creation_time' in stream['tags']:
+                    creation_time = stream['tags']['creation_time']
+                    break
+        
+        if creation_time:
+            # Handle different date formats
+            try:
+                # ISO format: 2020-05-20T15:30:10.000000Z
+                if creation_time.endswith('Z'):
+                    creation_time = creation_time[:-1] + '+00:00'
+                return datetime.fromisoformat(creation_time)
+            except ValueError:
                 try:
-                    # ISO format: 2020-05-20T15:30:10.000000Z
-                    return datetime.fromisoformat(creation_time.replace('Z', '+00:00'))
+                    # Try other common formats
+                    return datetime.strptime(creation_time, '%Y-%m-%d %H:%M:%S')
                 except ValueError:
-                    try:
-                        # Try other common formats
-                        return datetime.strptime(creation_time, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        logger.error(f"Could not parse creation time: {creation_time}")
-        except Exception as e:
-            logger.error(f"ffmpeg extraction failed for {file_path}: {e}")
+                    logger.error("Could not parse creation time: %s", creation_time)
+    except Exception as e:
+        logger.error("ffmpeg extraction failed for %s: %s", file_path, e)
     
     return None
 
-def get_file_date(file_path):
-    """Get the date taken from a media file, falling back to file modification time."""
-    file_ext = os.path.splitext(file_path)[1].lower()
+# Video date readers, in the same form as _IMAGE_DATE_EXTRACTORS
+_VIDEO_DATE_EXTRACTORS = tuple(fn for fn, available in [
+    (_date_from_mp4, True),
+    (_date_from_ffprobe, HAS_FFMPEG),
+] if available)
+
+def get_date_taken_from_video(file_path, file_ext=None):
+    """Extract the creation date from video metadata."""
+    if file_ext is None:
+        file_ext = _file_ext(file_path)
+    
+    for extractor in _VIDEO_DATE_EXTRACTORS:
+        date_taken = extractor(file_path, file_ext)
+        if date_taken is not None:
+            return date_taken
+    
+    return None
+
+def _is_utf8(path):
+    """Return whether a path can be encoded as UTF-8."""
+    try:
+        path.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+class _ExifToolBatch:
+    """Read dates from many files through a single stay_open exiftool process.
+
+    Starting exiftool (or ffprobe) for every file costs far more than reading
+    the metadata itself, so files are sent to one process in batches.
+    """
+    BATCH_SIZE = 500
+    
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            encoding='utf-8')
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.process.stdin.write('-stay_open\nFalse\n')
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+    
+    def _execute(self, file_paths):
+        """Run one exiftool command and return its parsed JSON output."""
+        args = ['-j', '-q', '-charset', 'filename=utf8', '-DateTimeOriginal', '-CreateDate']
+        args.extend(file_paths)
+        args.append('-execute')
+        self.process.stdin.write('\n'.join(args) + '\n')
+        self.process.stdin.flush()
+        
+        output = []
+        for line in self.process.stdout:
+            if line.rstrip() == '{ready}':
+                break
+            output.append(line)
+        else:
+            raise RuntimeError("exiftool exited unexpectedly")
+        
+        output = ''.join(output).strip()
+        return json.loads(output) if output else []
+    
+    def get_dates(self, file_paths):
+        """Return a dict of file path to date taken for the files exiftool has a date for."""
+        # Each argument goes on its own UTF-8 line, so names containing a newline
+        # or undecodable bytes cannot be passed; the per-file readers handle them
+        file_paths = [path for path in file_paths if '\n' not in path and _is_utf8(path)]
+        dates = {}
+        for start in range(0, len(file_paths), self.BATCH_SIZE):
+            for info in self._execute(file_paths[start:start + self.BATCH_SIZE]):
+                for tag in ('DateTimeOriginal', 'CreateDate'):
+                    value = info.get(tag)
+                    date_taken = isinstance(value, str) and _parse_exif_dt(value[:19])
+                    if date_taken:
+                        dates[info['SourceFile']] = date_taken
+                        break
+        return dates
+
+def get_file_date(file_path, st=None, file_ext=None):
+    """Get the date taken from a media file, falling back to file modification time.
+
+    ``st`` (the file's stat result) and ``file_ext`` (its lowercased extension)
+    are only looked up if the caller does not already have them.
+    """
+    if file_ext is None:
+        file_ext = _file_ext(file_path)
+    is_image = file_ext in IMAGE_EXTENSIONS
     
     # Try to get date from metadata
     date_taken = None
     
-    if file_ext in IMAGE_EXTENSIONS:
-        date_taken = get_date_taken_from_image(file_path)
+    if is_image:
+        date_taken = get_date_taken_from_image(file_path, file_ext)
     elif file_ext in VIDEO_EXTENSIONS:
-        date_taken = get_date_taken_from_video(file_path)
+        date_taken = get_date_taken_from_video(file_path, file_ext)
     
     # Fall back to file modification time if no EXIF data
     if not date_taken:
-        mtime = os.path.getmtime(file_path)
-        date_taken = datetime.fromtimestamp(mtime)
-        logger.info(f"No metadata date found for {file_path}, using modification time: {date_taken}")
+        if st is None:
+            st = os.stat(file_path)
+        date_taken = datetime.fromtimestamp(st.st_mtime)
+        logger.info("No metadata date found for %s, using modification time: %s", file_path, date_taken)
         
         # Try to add modification time to EXIF data for images
-        if file_ext in IMAGE_EXTENSIONS and HAS_PIL and HAS_PIEXIF:
+        if is_image and HAS_PIL and HAS_PIEXIF:
             try:
                 add_date_to_exif(file_path, date_taken)
-                logger.info(f"Added modification time to EXIF data for {file_path}")
+                logger.info("Added modification time to EXIF data for %s", file_path)
             except Exception as e:
-                logger.error(f"Failed to add modification time to EXIF data for {file_path}: {e}")
+                logger.error("Failed to add modification time to EXIF data for %s: %s", file_path, e)
     
     return date_taken
 
@@ -192,60 +609,272 @@ def add_date_to_exif(file_path, date_taken):
         
         return True
     except Exception as e:
-        logger.error(f"Error adding EXIF data: {e}")
+        logger.error("Error adding EXIF data: %s", e)
         return False
 
 def create_destination_path(dest_root, date_taken, file_path):
     """Create the destination path based on date taken."""
-    # Get month name
-    month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    month_name = month_names[date_taken.month - 1]
+    month = date_taken.month
     
     # Create directory in format "YYYY/MM - Month"
-    year_month_dir = os.path.join(dest_root, f"{date_taken.year:04d}", 
-                                 f"{date_taken.month:02d} - {month_name}")
-    os.makedirs(year_month_dir, exist_ok=True)
+    year_month_dir = f"{dest_root}{os.sep}{date_taken.year:04d}{os.sep}{month:02d} - {_MONTH_NAMES[month - 1]}"
+    if year_month_dir not in _created_dirs:
+        os.makedirs(year_month_dir, exist_ok=True)
+        _created_dirs.add(year_month_dir)
     
     # Use original filename
-    filename = os.path.basename(file_path)
+    filename = _file_name(file_path)
     return os.path.join(year_month_dir, filename)
 
-def process_file(file_path, dest_root, dry_run=False, copy_instead_of_move=False):
-    """Process a single media file."""
+def _fastcopy(src, dst):
+    """Copy the contents of src to dst, keeping the data in the kernel if possible.
+
+    Tries a reflink clone first, then os.sendfile, then shutil.copyfile, which
+    uses the platform's own fast path where there is one (e.g. fcopyfile on
+    macOS). File metadata is not copied.
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        
+        if HAS_FCNTL and sys.platform.startswith('linux'):
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                return
+            except OSError:
+                pass
+        
+        if hasattr(os, 'sendfile'):
+            offset = 0
+            try:
+                while True:
+                    sent = os.sendfile(dst_fd, src_fd, offset, SENDFILE_CHUNK_SIZE)
+                    if sent == 0:
+                        return
+                    offset += sent
+            except OSError:
+                # Some platforms only support sending to sockets
+                if offset:
+                    raise
+    
+    # Nothing has been written yet, so copyfile can start from scratch
+    shutil.copyfile(src, dst)
+
+def _dest_device(dest_dir):
+    """Return the device ID of a destination directory."""
+    device = _dest_devices.get(dest_dir)
+    if device is None:
+        device = _dest_devices[dest_dir] = os.stat(dest_dir).st_dev
+    return device
+
+def read_file_date(file_path, st=None, file_ext=None):
+    """Get the date taken for a media file, or None if it cannot be determined.
+
+    This is the expensive, metadata-reading half of processing a file. It has
+    no shared state, so it is safe to run in a worker thread or process.
+    """
     try:
-        date_taken = get_file_date(file_path)
-        dest_path = create_destination_path(dest_root, date_taken, file_path)
+        return get_file_date(file_path, st, file_ext)
+    except Exception as e:
+        logger.error("Error processing %s: %s", file_path, e)
+        return None
+
+def _claim_free_name(dest_path, dry_run=False):
+    """Find the first free 'name_N.ext' variant of an existing destination path.
+
+    Outside dry runs the name is claimed by atomically creating an empty
+    placeholder file, which the copy or move then replaces.
+    """
+    base, ext = os.path.splitext(dest_path)
+    counter = 1
+    while True:
+        candidate = f"{base}_{counter}{ext}"
+        try:
+            if dry_run:
+                os.stat(candidate)
+            else:
+                os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return candidate
+        except FileNotFoundError:
+            return candidate
+        except FileExistsError:
+            pass
+        counter += 1
+
+def transfer_file(file_path, dest_path, dry_run=False, copy_instead_of_move=False, st=None):
+    """Copy or move a file to its planned destination, resolving conflicts.
+
+    ``st`` is the source file's stat result, if the caller already has one.
+    Returns the path the file ended up at (or would, in a dry run), or False
+    on error.
+    """
+    claimed_path = None
+    try:
+        if st is None:
+            st = os.stat(file_path)
         
-        # Handle filename conflicts
-        if os.path.exists(dest_path) and os.path.getsize(file_path) != os.path.getsize(dest_path):
-            base, ext = os.path.splitext(dest_path)
-            counter = 1
-            while os.path.exists(dest_path):
-                dest_path = f"{base}_{counter}{ext}"
-                counter += 1
+        try:
+            dest_size = os.stat(dest_path).st_size
+        except FileNotFoundError:
+            dest_size = None
+        else:
+            # Adding a missing EXIF date may have rewritten the source since st was taken
+            st = os.stat(file_path)
         
         # Skip if destination exists and has same size
-        if os.path.exists(dest_path) and os.path.getsize(file_path) == os.path.getsize(dest_path):
-            logger.info(f"Skipping {file_path} (already exists at destination with same size)")
-            return
+        if dest_size == st.st_size:
+            logger.info("Skipping %s (already exists at destination with same size)", file_path)
+            return dest_path
+        
+        # Handle filename conflicts
+        if dest_size is not None:
+            dest_path = _claim_free_name(dest_path, dry_run)
+            if not dry_run:
+                claimed_path = dest_path
         
         if dry_run:
-            logger.info(f"Would {'copy' if copy_instead_of_move else 'move'} {file_path} to {dest_path}")
+            logger.info("Would %s %s to %s", 'copy' if copy_instead_of_move else 'move', file_path, dest_path)
         else:
             if copy_instead_of_move:
-                logger.debug(f"Copying {file_path} to {dest_path}")
-                shutil.copy2(file_path, dest_path)
+                logger.debug("Copying %s to %s", file_path, dest_path)
+                _fastcopy(file_path, dest_path)
+                shutil.copystat(file_path, dest_path)
             else:
-                logger.debug(f"Moving {file_path} to {dest_path}")
-                shutil.move(file_path, dest_path)
+                logger.debug("Moving %s to %s", file_path, dest_path)
+                # A rename within one filesystem is a metadata-only operation;
+                # only cross-device moves need to copy the data
+                if st.st_dev == _dest_device(os.path.dirname(dest_path)):
+                    os.replace(file_path, dest_path)
+                else:
+                    shutil.move(file_path, dest_path)
         
-        return True
+        return dest_path
     except Exception as e:
-        logger.error(f"Error processing {file_path}: {e}")
+        logger.error("Error processing %s: %s", file_path, e)
+        if claimed_path is not None:
+            try:
+                os.remove(claimed_path)
+            except OSError:
+                pass
         return False
 
-def process_directory(source_dir, dest_root, dry_run=False, copy_instead_of_move=False):
+class _ProcessedIndex:
+    """SQLite index of source files that have already been copied.
+
+    A source file is identified by its path, modification time and size, so a
+    rerun can skip files that have not changed since they were copied without
+    reading their metadata again. Paths are stored as bytes from os.fsencode,
+    so names that are not valid UTF-8 round-trip. A failed lookup or update is
+    logged and treated as a cache miss rather than stopping the run.
+    """
+    
+    def __init__(self, dest_root):
+        # Lookups happen in the walker thread, updates in the main thread
+        self.connection = sqlite3.connect(os.path.join(dest_root, INDEX_FILE_NAME),
+                                          check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS processed '
+            '(src BLOB PRIMARY KEY, mtime REAL, size INTEGER, dest BLOB)')
+        self.uncommitted = 0
+    
+    def close(self):
+        """Commit outstanding updates and close the database."""
+        try:
+            self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error("Failed to save index: %s", e)
+        finally:
+            self.connection.close()
+    
+    def lookup(self, file_path, st):
+        """Return where an unchanged source file was copied to, or None."""
+        try:
+            row = self.connection.execute(
+                'SELECT dest FROM processed WHERE src = ? AND mtime = ? AND size = ?',
+                (os.fsencode(file_path), st.st_mtime, st.st_size)).fetchone()
+            if row is None or not isinstance(row[0], bytes):
+                return None
+            return os.fsdecode(row[0])
+        except (sqlite3.Error, UnicodeError) as e:
+            logger.warning("Index lookup failed for %s: %s", file_path, e)
+            return None
+    
+    def record(self, file_path, st, dest_path):
+        """Record that a source file has been copied to dest_path."""
+        try:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO processed (src, mtime, size, dest) VALUES (?, ?, ?, ?)',
+                (os.fsencode(file_path), st.st_mtime, st.st_size, os.fsencode(dest_path)))
+            self.uncommitted += 1
+            if self.uncommitted >= INDEX_COMMIT_INTERVAL:
+                self.connection.commit()
+                self.uncommitted = 0
+        except (sqlite3.Error, UnicodeError) as e:
+            logger.warning("Failed to add %s to index: %s", file_path, e)
+
+def _iter_files(root):
+    """Recursively yield a DirEntry for every file below root."""
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _iter_files(entry.path)
+                elif entry.is_file():
+                    yield entry
+    except OSError as e:
+        logger.error("Cannot read directory %s: %s", root, e)
+
+def process_file(file_path, dest_root, dry_run=False, copy_instead_of_move=False, date_taken=None, st=None):
+    """Process a single media file.
+
+    ``date_taken`` and ``st`` (the file's stat result) are only looked up if the
+    caller does not already have them. Returns the destination path, or False
+    on error.
+    """
+    # Stat once and share the result between the date lookup and the transfer
+    if st is None:
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            logger.error("Error processing %s: %s", file_path, e)
+            return False
+    
+    if date_taken is None:
+        date_taken = read_file_date(file_path, st)
+        if date_taken is None:
+            return False
+    
+    try:
+        dest_path = create_destination_path(dest_root, date_taken, file_path)
+    except OSError as e:
+        logger.error("Error processing %s: %s", file_path, e)
+        return False
+    
+    return transfer_file(file_path, dest_path, dry_run, copy_instead_of_move, st)
+
+def _read_media_date(item):
+    """Read the date of a queued (file_path, st, file_ext) item in a worker."""
+    file_path, st, file_ext = item
+    return file_path, read_file_date(file_path, st, file_ext)
+
+def _collect_date(dates, file_path, future):
+    """Store the date read by a worker, logging the file if the worker failed."""
+    try:
+        dates[file_path] = future.result()[1]
+    except Exception as e:
+        # e.g. a killed worker process; files without a date are counted as errors
+        logger.error("Error processing %s: %s", file_path, e)
+
+def _metadata_executor(workers=None, use_processes=False):
+    """Create the executor used to read media dates."""
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=workers, initializer=logger.setLevel,
+                                   initargs=(logger.level,))
+    # Reading metadata mostly waits on file I/O, so use more threads than CPUs
+    return ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4))
+
+def process_directory(source_dir, dest_root, dry_run=False, copy_instead_of_move=False,
+                      workers=None, use_processes=False, use_index=True):
     """Recursively process all media files in the source directory."""
     source_dir = os.path.abspath(source_dir)
     dest_root = os.path.abspath(dest_root)
@@ -258,22 +887,137 @@ def process_directory(source_dir, dest_root, dry_run=False, copy_instead_of_move
     error_count = 0
     skipped_count = 0
     
-    for root, _, files in os.walk(source_dir):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            file_ext = os.path.splitext(filename)[1].lower()
-            
-            if file_ext in MEDIA_EXTENSIONS:
-                result = process_file(file_path, dest_root, dry_run, copy_instead_of_move)
-                if result:
-                    success_count += 1
-                else:
+    # Copied files are recorded in an index in the destination directory, so
+    # unchanged files are skipped on later runs. Moved files are gone from the
+    # source, so only copies need indexing. A dry run may read an existing
+    # index, but never creates one.
+    index = None
+    if use_index and copy_instead_of_move and (
+            not dry_run or os.path.exists(os.path.join(dest_root, INDEX_FILE_NAME))):
+        try:
+            index = _ProcessedIndex(dest_root)
+        except sqlite3.Error as e:
+            logger.error("Cannot open index in %s: %s", dest_root, e)
+    
+    # Non-media files can far outnumber media files in mixed directories
+    log_skipped = logger.isEnabledFor(logging.INFO)
+    
+    media_queue = queue.Queue(maxsize=MEDIA_QUEUE_SIZE)
+    
+    walk_error = None
+    
+    def walk():
+        """Queue (file_path, st, file_ext) for each media file that needs processing."""
+        nonlocal success_count, error_count, skipped_count, walk_error
+        try:
+            for entry in _iter_files(source_dir):
+                file_ext = _file_ext(entry.name)
+                if file_ext not in MEDIA_EXTENSIONS:
+                    skipped_count += 1
+                    if log_skipped:
+                        logger.info("Skipping non-media file: %s", entry.path)
+                    continue
+                
+                try:
+                    # DirEntry objects cannot be sent to worker processes, but
+                    # their (cached) stat results can
+                    st = entry.stat()
+                    
+                    if index is not None:
+                        indexed_dest = index.lookup(entry.path, st)
+                        if indexed_dest is not None and os.path.exists(indexed_dest):
+                            logger.info("Skipping %s (already copied to %s)", entry.path, indexed_dest)
+                            success_count += 1
+                            continue
+                except Exception as e:
+                    logger.error("Error processing %s: %s", entry.path, e)
                     error_count += 1
+                    continue
+                
+                media_queue.put((entry.path, st, file_ext))
+        except Exception as e:
+            # Reported by the main thread once the walk has finished
+            walk_error = e
+        finally:
+            media_queue.put(None)
+    
+    media = []
+    
+    def queued_media():
+        for item in iter(media_queue.get, None):
+            media.append(item)
+            yield item
+    
+    dates = {}
+    try:
+        # Walk the source tree in a separate thread, so that dates are read while
+        # the rest of the tree is still being listed
+        walker = threading.Thread(target=walk, name='photoSort-walker', daemon=True)
+        walker.start()
+        
+        pending = queued_media()
+        if HAS_EXIFTOOL:
+            # exiftool reads all files in one session, so wait for the whole list
+            pending = list(pending)
+            if pending:
+                try:
+                    with _ExifToolBatch() as exiftool:
+                        dates = exiftool.get_dates([file_path for file_path, _, _ in pending])
+                except Exception as e:
+                    logger.error("exiftool extraction failed: %s", e)
+            pending = [item for item in pending if item[0] not in dates]
+        
+        # Read the remaining dates in parallel, with threads or processes
+        if workers == 1:
+            for item in pending:
+                file_path, date_taken = _read_media_date(item)
+                dates[file_path] = date_taken
+        else:
+            # Submit as files arrive rather than with executor.map, which
+            # consumes its whole input up front and would drain the queue. With
+            # at most MEDIA_QUEUE_SIZE reads in flight, the walker waits for the
+            # readers instead of listing the whole tree ahead.
+            with _metadata_executor(workers, use_processes) as executor:
+                in_flight = deque()
+                for item in pending:
+                    if len(in_flight) >= MEDIA_QUEUE_SIZE:
+                        _collect_date(dates, *in_flight.popleft())
+                    try:
+                        in_flight.append((item[0], executor.submit(_read_media_date, item)))
+                    except Exception as e:
+                        # e.g. BrokenProcessPool; the file is counted as an error below
+                        logger.error("Error processing %s: %s", item[0], e)
+                while in_flight:
+                    _collect_date(dates, *in_flight.popleft())
+        
+        walker.join()
+        if walk_error is not None:
+            logger.error("Failed to scan %s, some files were not processed: %s", source_dir, walk_error)
+            error_count += 1
+        
+        # Copy or move the files one at a time in this process, so that
+        # filename conflict resolution never races
+        for file_path, st, _ in media:
+            date_taken = dates.get(file_path)
+            dest_path = date_taken is not None and process_file(
+                file_path, dest_root, dry_run, copy_instead_of_move, date_taken, st)
+            if dest_path:
+                success_count += 1
+                if index is not None and not dry_run:
+                    # Stat again, as adding a missing EXIF date rewrites the source
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        pass
+                    index.record(file_path, st, dest_path)
             else:
-                skipped_count += 1
-                logger.info(f"Skipping non-media file: {file_path}")
+                error_count += 1
+    finally:
+        if index is not None:
+            index.close()
     
-    logger.info(f"Processing complete: {success_count} files processed, {error_count} errors, {skipped_count} skipped")
+    logger.info("Processing complete: %d files processed, %d errors, %d skipped",
+                success_count, error_count, skipped_count)
     return success_count > 0 and error_count == 0
 
 def main():
@@ -284,6 +1028,13 @@ def main():
     parser.add_argument('--dry-run', action='store_true', help='Show what would be done without making changes')
     parser.add_argument('--copy', action='store_true', help='Copy files instead of moving them')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of workers reading metadata (default: 4 threads per CPU up to 32, '
+                             'or one process per CPU with --processes)')
+    parser.add_argument('--processes', action='store_true',
+                        help='Read metadata in worker processes instead of threads')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Do not use or update the index of files already copied to the destination')
     
     args = parser.parse_args()
     
@@ -293,16 +1044,21 @@ def main():
     if not check_dependencies():
         sys.exit(1)
     
+    if args.workers is not None and args.workers < 1:
+        logger.error("--workers must be at least 1, got %s", args.workers)
+        sys.exit(1)
+    
     if not os.path.isdir(args.source):
-        logger.error(f"Source directory does not exist: {args.source}")
+        logger.error("Source directory does not exist: %s", args.source)
         sys.exit(1)
     
     os.makedirs(args.destination, exist_ok=True)
     
-    logger.info(f"Starting media sort from {args.source} to {args.destination}")
-    logger.info(f"Mode: {'Dry run' if args.dry_run else 'Copy' if args.copy else 'Move'}")
+    logger.info("Starting media sort from %s to %s", args.source, args.destination)
+    logger.info("Mode: %s", 'Dry run' if args.dry_run else 'Copy' if args.copy else 'Move')
     
-    success = process_directory(args.source, args.destination, args.dry_run, args.copy)
+    success = process_directory(args.source, args.destination, args.dry_run, args.copy,
+                                args.workers, args.processes, not args.no_index)
     
     if success:
         logger.info("Media sorting completed successfully")